@@ -0,0 +1,37 @@
+# backend/csv_import.py
+# Chunked read/write steps shared by import_bands_csv and import_venues_csv
+import itertools
+from typing import Any, Dict, Iterator, List
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+
+def iter_chunks(reader, width: int, size: int) -> Iterator[List[List[str]]]:
+    """Yield the remaining CSV rows `size` at a time, without blank lines and padded to `width` columns.
+
+    Rows stay plain lists; callers resolve their column positions from the header once.
+    """
+    # Stream the CSV in chunks; each chunk is written and committed on its own
+    while True:
+        batch = list(itertools.islice(reader, size))
+        if not batch:
+            return
+        yield [row + [""] * (width - len(row)) for row in batch if row]
+
+
+def write_chunk(db: Session, model, to_insert: Dict[Any, Dict[str, Any]], to_update: Dict[int, Dict[str, Any]]) -> None:
+    """Insert the new rows, bulk-update the changed ones and commit the chunk.
+
+    Inserted row dicts get their "id" filled in, so once the caller adds them to
+    its index, later chunks can update them like any existing row.
+    """
+    if to_insert:
+        rows = list(to_insert.values())
+        # RETURNING gives later chunks the ids they need to update these rows
+        ids = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows).scalars()
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+    if to_update:
+        # ORM bulk UPDATE by primary key (one executemany)
+        db.execute(update(model), list(to_update.values()))
+    db.commit()
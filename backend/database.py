@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -10,5 +10,20 @@ engine = create_engine(
 DB_URL,
 connect_args={"check_same_thread": False} if DB_URL.startswith("sqlite") else {},
 )
+
+
+if DB_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        # WAL lets readers run alongside a writer; NORMAL fsyncs only at checkpoints
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cur.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
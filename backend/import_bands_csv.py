@@ -1,76 +1,97 @@
-import argparse, csv, os, sys
-from typing import Optional
-from .database import Base, engine, SessionLocal
+import argparse, csv, os, string, sys
+from typing import Any, Dict, Optional
+from sqlalchemy import func, select
+from .csv_import import iter_chunks, write_chunk
+from .database import SessionLocal
+from .init_db import init_db_if_missing
 from .models import Band
 
+# SQLite's lower() folds ASCII letters only; CSV names are folded the same way so
+# they match the keys of ix_bands_name_lower ("Éclipse" and "éclipse" stay distinct)
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
 def main():
     ap = argparse.ArgumentParser(description="Import bands from CSV into bali_gigs.db")
     ap.add_argument("csv_path", help="Path to CSV with header: band,genre,country,city")
     ap.add_argument("--encoding", default="utf-8", help="File encoding (default: utf-8)")
     ap.add_argument("--delimiter", default=",", help="CSV delimiter (default: ,)")
     ap.add_argument("--dry-run", action="store_true", help="Parse only; do not write DB")
+    ap.add_argument("--chunk-size", type=int, default=5000, help="Rows per DB commit (default: 5000)")
     args = ap.parse_args()
+    if args.chunk_size < 1:
+        ap.error("--chunk-size must be at least 1")
 
     if not os.path.exists(args.csv_path):
         print(f"CSV not found: {args.csv_path}", file=sys.stderr)
         sys.exit(1)
 
     # Ensure tables exist
-    Base.metadata.create_all(bind=engine)
+    init_db_if_missing()
 
     # Read CSV with header
     with open(args.csv_path, "r", encoding=args.encoding, newline="") as f:
-        reader = csv.DictReader(f, delimiter=args.delimiter)
+        reader = csv.reader(f, delimiter=args.delimiter)
         # normalize header names
-        fieldmap = {k.lower().strip(): k for k in reader.fieldnames or []}
+        header = [h.lower().strip() for h in next(reader, [])]
         required = ["band", "genre", "country", "city"]
-        missing = [r for r in required if r not in fieldmap]
+        missing = [r for r in required if r not in header]
         if missing:
             print(f"CSV header must include: {', '.join(required)}. Missing: {missing}", file=sys.stderr)
             sys.exit(2)
+        col_band, col_genre, col_country, col_city = (header.index(r) for r in required)
+        width = len(header)
 
         db = SessionLocal()
         created = updated = skipped = 0
         try:
-            for row in reader:
-                name = (row[fieldmap["band"]] or "").strip()
-                if not name:
-                    skipped += 1
-                    continue
-                genre: Optional[str] = (row[fieldmap["genre"]] or "").strip() or None
-                country: Optional[str] = (row[fieldmap["country"]] or "").strip() or None
-                city_in: Optional[str] = (row[fieldmap["city"]] or "").strip() or None
+            # Existing bands keyed by lower(name), the key ix_bands_name_lower keeps unique:
+            # one SELECT instead of one per CSV row
+            index = {}
+            for key, *cols in db.execute(select(func.lower(Band.name), Band.id, Band.name, Band.genre, Band.city)):
+                index[key] = dict(zip(("id", "name", "genre", "city"), cols))
 
-                # Choose what to store in Band.city
-                city_final = city_in or country
+            for batch in iter_chunks(reader, width, args.chunk_size):
+                to_insert: Dict[str, Dict[str, Any]] = {}
+                to_update: Dict[int, Dict[str, Any]] = {}
 
-                existing = db.query(Band).filter(Band.name == name).one_or_none()
-                if existing:
-                    changed = False
-                    if genre and genre != existing.genre:
-                        existing.genre = genre; changed = True
-                    if city_final and city_final != existing.city:
-                        existing.city = city_final; changed = True
-                    if changed:
-                        updated += 1
-                    else:
+                for row in batch:
+                    name = row[col_band].strip()
+                    if not name:
                         skipped += 1
-                else:
-                    db.add(Band(
-                        name=name,
-                        genre=genre,
-                        city=city_final,
-                        instagram=None,
-                        youtube=None,
-                        description=None
-                    ))
-                    created += 1
+                        continue
+                    genre: Optional[str] = row[col_genre].strip() or None
+                    country: Optional[str] = row[col_country].strip() or None
+                    city_in: Optional[str] = row[col_city].strip() or None
+
+                    # Choose what to store in Band.city
+                    city_final = city_in or country
+
+                    # Bands repeated within the CSV merge into their pending insert
+                    key = name.translate(_ASCII_LOWER)
+                    current = index.get(key) or to_insert.get(key)
+                    if current:
+                        changed = False
+                        if genre and genre != current["genre"]:
+                            current["genre"] = genre; changed = True
+                        if city_final and city_final != current["city"]:
+                            current["city"] = city_final; changed = True
+                        if changed:
+                            if "id" in current:
+                                to_update[current["id"]] = current
+                            updated += 1
+                        else:
+                            skipped += 1
+                    else:
+                        to_insert[key] = {"name": name, "genre": genre, "city": city_final}
+                        created += 1
+
+                if not args.dry_run:
+                    write_chunk(db, Band, to_insert, to_update)
+                index.update(to_insert)
 
             if args.dry_run:
-                db.rollback()
                 print(f"[DRY RUN] Would create: {created}, update: {updated}, skip: {skipped}")
             else:
-                db.commit()
                 print(f"Created: {created}, Updated: {updated}, Skipped: {skipped}")
         finally:
             db.close()
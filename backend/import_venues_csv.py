@@ -1,8 +1,14 @@
-import argparse, csv, os, sys, json, re, time
+import argparse, asyncio, csv, os, sys, re, sqlite3
 from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse
+import orjson
+from sqlalchemy import select
+from geopy.adapters import AioHTTPAdapter
 from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from .database import Base, engine, SessionLocal
+from geopy.extra.rate_limiter import AsyncRateLimiter
+from .csv_import import iter_chunks, write_chunk
+from .database import SessionLocal
+from .init_db import init_db_if_missing
 from .models import Venue
 
 # -----------------------------
@@ -29,7 +35,24 @@ ABBR_MAP = {
     r"\bRegency\b": "",
 }
 
+# All abbreviations folded into one alternation so each address is scanned once;
+# the named group that matched picks the replacement. Every key starts with \b
+# and a letter, so the boundary and a first-letter class are hoisted in front:
+# most positions are rejected by one class test instead of trying every branch.
+assert all(pat.startswith(r"\b") and pat[2].isalpha() for pat in ABBR_MAP), \
+    "ABBR_MAP keys must start with \\b and a letter (see _ABBR_RE)"
+_ABBR_REPL = {f"g{i}": repl for i, repl in enumerate(ABBR_MAP.values())}
+_ABBR_FIRST = "".join(sorted({pat[2].lower() for pat in ABBR_MAP}))
+_ABBR_RE = re.compile(
+    rf"(?=[{_ABBR_FIRST}])\b(?:" + "|".join(f"(?P<g{i}>{pat[2:]})" for i, pat in enumerate(ABBR_MAP)) + ")",
+    re.IGNORECASE,
+)
+
 POSTCODE_RE = re.compile(r"\b\d{5}\b")
+_HTTP_RE = re.compile(r"^https?://", re.IGNORECASE)
+_IG_TRAIL_RE = re.compile(r"/+$")
+_WS_COMMA_RE = re.compile(r"\s*,\s*")
+_DOUBLE_WS_RE = re.compile(r"\s{2,}")
 
 # -----------------------------
 # Helpers
@@ -41,11 +64,10 @@ def normalize_address(addr: str) -> str:
     # strip postal code
     a = POSTCODE_RE.sub("", a)
     # expand/drop abbreviations
-    for pat, repl in ABBR_MAP.items():
-        a = re.sub(pat, repl, a, flags=re.IGNORECASE)
+    a = _ABBR_RE.sub(lambda m: _ABBR_REPL[m.lastgroup], a)
     # tidy punctuation/spacing
-    a = re.sub(r"\s*,\s*", ", ", a)
-    a = re.sub(r"\s{2,}", " ", a).strip(", ").strip()
+    a = _WS_COMMA_RE.sub(", ", a)
+    a = _DOUBLE_WS_RE.sub(" ", a).strip(", ").strip()
     # ensure Bali & Indonesia present
     if "bali" not in a.lower():
         a += ", Bali"
@@ -59,23 +81,68 @@ def clean_instagram(handle: Optional[str]) -> Optional[str]:
     h = handle.strip()
     if h.startswith("@"):
         h = h[1:]
-    return re.sub(r"/+$", "", h) or None
+    return _IG_TRAIL_RE.sub("", h) or None
 
 def resolve_website(insta_link: Optional[str]) -> Optional[str]:
     if not insta_link:
         return None
     u = insta_link.strip()
-    return u if re.match(r"^https?://", u, flags=re.I) else None
+    return u if _HTTP_RE.match(u) else None
+
+def open_geocode_cache(path: str) -> sqlite3.Connection:
+    """Open the SQLite geocode cache, seeding a new one from the legacy JSON cache if present.
+
+    `path` is used as given, with the legacy cache looked up as `<name>.json`
+    beside it; an old `--cache geocode_cache.json` maps to `geocode_cache.db`.
+    """
+    base, ext = os.path.splitext(path)
+    if ext.lower() == ".json":
+        db_path, legacy_path = base + ".db", path
+    else:
+        db_path, legacy_path = path, base + ".json"
+    fresh = not os.path.exists(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS geo (k TEXT PRIMARY KEY, lat REAL, lon REAL)")
+    if fresh and os.path.exists(legacy_path):
+        try:
+            with open(legacy_path, "rb") as f:
+                legacy = orjson.loads(f.read())
+            conn.executemany(
+                "INSERT OR REPLACE INTO geo VALUES (?, ?, ?)",
+                ((k, v["lat"], v["lon"]) for k, v in legacy.items()),
+            )
+            conn.commit()
+        except Exception as e:
+            print(f"[WARN] Failed to import legacy cache {legacy_path}: {e}", file=sys.stderr)
+    return conn
+
+def cache_get(cache: sqlite3.Connection, key: str) -> Optional[Dict[str, float]]:
+    row = cache.execute("SELECT lat, lon FROM geo WHERE k = ?", (key,)).fetchone()
+    return {"lat": row[0], "lon": row[1]} if row else None
 
-def geocode_bali(geocode, cache: Dict[str, Any], raw_address: str, tries: int = 2, sleep: float = 0.8) -> Optional[Dict[str, float]]:
-    """Try multiple Bali-biased candidate strings; cache results."""
-    key = (raw_address or "").strip()
-    if key in cache:
-        return cache[key]
+def cache_put(cache: sqlite3.Connection, key: str, res: Dict[str, float]) -> None:
+    # committed per hit so an interrupted import keeps everything geocoded so far
+    cache.execute("INSERT OR REPLACE INTO geo VALUES (?, ?, ?)", (key, res["lat"], res["lon"]))
+    cache.commit()
 
-    candidates: List[str] = []
-    norm = normalize_address(raw_address)
-    candidates.append(norm)
+async def geocode_bali(geocode, cache: sqlite3.Connection, raw_address: str, tries: int = 2, sleep: float = 0.8,
+                       norm: Optional[str] = None) -> Optional[Dict[str, float]]:
+    """Try multiple Bali-biased candidate strings; cache results under the normalized address.
+
+    Pass `norm` when the caller has already run normalize_address on `raw_address`.
+    """
+    if norm is None:
+        norm = normalize_address(raw_address)
+    hit = cache_get(cache, norm)
+    if not hit:
+        # caches from before keys were normalized hold the raw address; migrate on hit
+        hit = cache_get(cache, (raw_address or "").strip())
+        if hit:
+            cache_put(cache, norm, hit)
+    if hit:
+        return hit
+
+    candidates: List[str] = [norm]
 
     # fallback 1: keep venue + first locality piece only
     parts = [p.strip() for p in norm.split(",") if p.strip()]
@@ -92,7 +159,7 @@ def geocode_bali(geocode, cache: Dict[str, Any], raw_address: str, tries: int =
 
     for cand in candidates:
         for _ in range(tries):
-            loc = geocode(
+            loc = await geocode(
                 cand,
                 exactly_one=True,
                 country_codes="id",
@@ -102,11 +169,43 @@ def geocode_bali(geocode, cache: Dict[str, Any], raw_address: str, tries: int =
             )
             if loc:
                 res = {"lat": float(loc.latitude), "lon": float(loc.longitude)}
-                cache[key] = res
+                cache_put(cache, norm, res)
                 return res
-            time.sleep(sleep)
+            await asyncio.sleep(sleep)
     return None
 
+def open_geolocator(nominatim_url: Optional[str] = None) -> Nominatim:
+    """Async Nominatim client for the public server, or for a self-hosted instance
+    at `nominatim_url` (see docker-compose.nominatim.yml).
+
+    Build one per import and enter it with `async with`: the AsyncRateLimiter
+    wrapped around it lets its first call through immediately, so a limiter
+    recreated per chunk would not keep requests `--sleep` apart.
+    """
+    server = {}
+    if nominatim_url:
+        # accept a bare host:port; urlparse would read "localhost" as the scheme
+        u = urlparse(nominatim_url if "//" in nominatim_url else "http://" + nominatim_url)
+        server = {"domain": u.netloc + u.path.rstrip("/"), "scheme": u.scheme or "http"}
+    return Nominatim(user_agent="bali-gigs-importer", adapter_factory=AioHTTPAdapter, **server)
+
+async def geocode_many(geocode, addresses: Dict[str, str], cache: sqlite3.Connection, sleep: float,
+                       concurrency: int = 1) -> Dict[str, Optional[Dict[str, float]]]:
+    """Geocode {normalized: raw} addresses with up to `concurrency` requests in flight;
+    results are keyed by the normalized address.
+
+    `geocode` is the import's rate-limited geocoder, which still spaces request
+    starts by `sleep` seconds, so raising concurrency only overlaps round-trips;
+    keep it at 1 for public Nominatim, which has a 1 request/second policy.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(norm: str, address: str):
+        async with sem:
+            return norm, await geocode_bali(geocode, cache, address, tries=2, sleep=sleep, norm=norm)
+
+    return dict(await asyncio.gather(*(one(n, a) for n, a in addresses.items())))
+
 # -----------------------------
 # Main importer
 # -----------------------------
@@ -117,109 +216,126 @@ def main():
     ap.add_argument("--encoding", default="utf-8")
     ap.add_argument("--delimiter", default=",")
     ap.add_argument("--dry-run", action="store_true")
-    ap.add_argument("--cache", default="geocode_cache.json")
-    ap.add_argument("--sleep", type=float, default=1.0, help="Seconds between geocoder calls (be nice to Nominatim)")
+    ap.add_argument("--chunk-size", type=int, default=5000, help="Rows per DB commit (default: 5000)")
+    ap.add_argument("--cache", default="geocode_cache.db", help="SQLite geocode cache path; a legacy .json cache beside it is imported once (a .json path writes to the .db beside it)")
+    ap.add_argument("--nominatim-url", help="Self-hosted Nominatim base URL, e.g. http://localhost:8080 (default: public server)")
+    ap.add_argument("--sleep", type=float, help="Seconds between geocoder calls (default: 1.0 for public Nominatim, 0 with --nominatim-url)")
+    ap.add_argument("--concurrency", type=int, default=1, help="Geocoder requests in flight (keep 1 for public Nominatim)")
     args = ap.parse_args()
+    if args.chunk_size < 1:
+        ap.error("--chunk-size must be at least 1")
+    if args.sleep is None:
+        args.sleep = 0.0 if args.nominatim_url else 1.0  # be nice to public Nominatim
 
     if not os.path.exists(args.csv_path):
         print(f"CSV not found: {args.csv_path}", file=sys.stderr)
         sys.exit(1)
 
-    Base.metadata.create_all(bind=engine)
+    init_db_if_missing()
+    asyncio.run(import_venues(args))
 
-    # Load geocode cache
-    cache: Dict[str, Any] = {}
-    if os.path.exists(args.cache):
-        try:
-            with open(args.cache, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-        except Exception:
-            cache = {}
+async def import_venues(args: argparse.Namespace) -> None:
+    cache = open_geocode_cache(args.cache)
 
     # Read CSV
     with open(args.csv_path, "r", encoding=args.encoding, newline="") as f:
-        reader = csv.DictReader(f, delimiter=args.delimiter)
-        headers = [h.strip() for h in (reader.fieldnames or [])]
+        reader = csv.reader(f, delimiter=args.delimiter)
+        headers = [h.strip() for h in next(reader, [])]
 
         # Your sample shows: "Venue,Address / Notes,Instagram name, Instgram link"
-        wanted = ["Venue", "Address / Notes", "Instagram name", " Instgram link"]
-        # Some sheets omit the leading space before Instgram link
-        if "Instgram link" in headers and " Instgram link" not in headers:
-            wanted[-1] = "Instgram link"
+        # (headers are stripped, so sheets with or without the leading space both match)
+        wanted = ["Venue", "Address / Notes", "Instagram name", "Instgram link"]
 
         for w in wanted:
             if w not in headers:
                 print(f"CSV header missing required column: {w}\nHeaders found: {headers}", file=sys.stderr)
                 sys.exit(2)
+        col_name, col_address, col_insta_name, col_insta_link = (headers.index(w) for w in wanted)
+        width = len(headers)
 
-        geolocator = Nominatim(user_agent="bali-gigs-importer")
-        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=args.sleep)
+        # one client and rate limiter for the whole import, so --sleep spacing holds across chunks
+        async with open_geolocator(args.nominatim_url) as geolocator:
+            geocode = AsyncRateLimiter(geolocator.geocode, min_delay_seconds=args.sleep)
+            db = SessionLocal()
+            created = updated = skipped = failed = 0
+            try:
+                # Existing venues keyed by name: one SELECT instead of one per CSV row
+                index = {r.name: r._asdict() for r in db.execute(select(
+                    Venue.id, Venue.name, Venue.address, Venue.lat, Venue.lon, Venue.instagram, Venue.website,
+                ))}
 
-        db = SessionLocal()
-        created = updated = skipped = failed = 0
-        try:
-            for row in reader:
-                name = (row.get("Venue") or "").strip()
-                address = (row.get("Address / Notes") or "").strip()
-                insta_name = clean_instagram(row.get("Instagram name"))
-                insta_link = (row.get(" Instgram link") or row.get("Instgram link") or "").strip()
-
-                if not name or not address:
-                    skipped += 1
-                    continue
-
-                loc = geocode_bali(geocode, cache, address, tries=2, sleep=args.sleep)
-                if not loc:
-                    print(f"[WARN] Could not geocode: {name} | {address}", file=sys.stderr)
-                    failed += 1
-                    continue
-
-                website = resolve_website(insta_link)
-
-                existing: Optional[Venue] = db.query(Venue).filter(Venue.name == name).one_or_none()
-                if existing:
-                    changed = False
-                    if existing.address != address:
-                        existing.address = address; changed = True
-                    if existing.lat != loc["lat"] or existing.lon != loc["lon"]:
-                        existing.lat, existing.lon = loc["lat"], loc["lon"]; changed = True
-                    if existing.instagram != insta_name:
-                        existing.instagram = insta_name; changed = True
-                    if website and existing.website != website:
-                        existing.website = website; changed = True
-                    if changed:
-                        updated += 1
-                    else:
-                        skipped += 1
+                for batch in iter_chunks(reader, width, args.chunk_size):
+                    to_insert: Dict[str, Dict[str, Any]] = {}
+                    to_update: Dict[int, Dict[str, Any]] = {}
+
+                    parsed: List[Tuple[str, str, Optional[str], str]] = []
+                    for row in batch:
+                        name = row[col_name].strip()
+                        address = row[col_address].strip()
+                        if not name or not address:
+                            skipped += 1
+                            continue
+                        parsed.append((name, address, clean_instagram(row[col_insta_name]), row[col_insta_link].strip()))
+
+                    # Addresses that normalize to the same string are geocoded once, concurrently;
+                    # rows are then applied in CSV order
+                    norms = {address: normalize_address(address) for _, address, _, _ in parsed}
+                    reps: Dict[str, str] = {}
+                    for address, norm in norms.items():
+                        reps.setdefault(norm, address)
+                    found = await geocode_many(geocode, reps, cache, args.sleep, args.concurrency)
+                    locs = {address: found[norm] for address, norm in norms.items()}
+
+                    for name, address, insta_name, insta_link in parsed:
+                        loc = locs[address]
+                        if not loc:
+                            print(f"[WARN] Could not geocode: {name} | {address}", file=sys.stderr)
+                            failed += 1
+                            continue
+
+                        website = resolve_website(insta_link)
+
+                        # Venues repeated within the CSV merge into their pending insert
+                        existing = index.get(name) or to_insert.get(name)
+                        if existing:
+                            changed = False
+                            if existing["address"] != address:
+                                existing["address"] = address; changed = True
+                            if existing["lat"] != loc["lat"] or existing["lon"] != loc["lon"]:
+                                existing["lat"], existing["lon"] = loc["lat"], loc["lon"]; changed = True
+                            if existing["instagram"] != insta_name:
+                                existing["instagram"] = insta_name; changed = True
+                            if website and existing["website"] != website:
+                                existing["website"] = website; changed = True
+                            if changed:
+                                if "id" in existing:
+                                    to_update[existing["id"]] = existing
+                                updated += 1
+                            else:
+                                skipped += 1
+                        else:
+                            to_insert[name] = {
+                                "name": name,
+                                "address": address,
+                                "district": None,  # optional; parse later if needed
+                                "lat": loc["lat"],
+                                "lon": loc["lon"],
+                                "instagram": insta_name,
+                                "website": website,
+                            }
+                            created += 1
+
+                    if not args.dry_run:
+                        write_chunk(db, Venue, to_insert, to_update)
+                    index.update(to_insert)
+
+                if args.dry_run:
+                    print(f"[DRY RUN] Create: {created}, Update: {updated}, Skip: {skipped}, Geocode-failed: {failed}")
                 else:
-                    v = Venue(
-                        name=name,
-                        address=address,
-                        district=None,  # optional; parse later if needed
-                        lat=loc["lat"],
-                        lon=loc["lon"],
-                        instagram=insta_name,
-                        website=website,
-                        notes=None
-                    )
-                    db.add(v)
-                    created += 1
-
-            # Save cache
-            try:
-                with open(args.cache, "w", encoding="utf-8") as f:
-                    json.dump(cache, f, ensure_ascii=False, indent=2)
-            except Exception as e:
-                print(f"[WARN] Failed to write cache: {e}", file=sys.stderr)
-
-            if args.dry_run:
-                db.rollback()
-                print(f"[DRY RUN] Create: {created}, Update: {updated}, Skip: {skipped}, Geocode-failed: {failed}")
-            else:
-                db.commit()
-                print(f"Created: {created}, Updated: {updated}, Skipped: {skipped}, Geocode-failed: {failed}")
-        finally:
-            db.close()
+                    print(f"Created: {created}, Updated: {updated}, Skipped: {skipped}, Geocode-failed: {failed}")
+            finally:
+                db.close()
+                cache.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,66 @@
+# backend/init_db.py
+# One-shot schema setup: python -m backend.init_db
+from sqlalchemy import delete, func, inspect, select, text, update
+from sqlalchemy.schema import CreateIndex
+from .database import Base, engine
+from .models import Band, event_bands
+
+
+def _has_index(conn, table: str, name: str) -> bool:
+    if conn.dialect.name == "sqlite":
+        # SQLite reflection skips expression indexes, so ask sqlite_master directly
+        row = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :n"), {"n": name}).first()
+        return row is not None
+    return name in {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def _merge_case_duplicate_bands():
+    """Fold bands whose names differ only by case into the oldest one.
+
+    One-time backfill so ix_bands_name_lower can be built on an existing
+    database; skipped once that index exists. The folded rows are deleted
+    (their genre/city/links are dropped), so each fold is printed.
+    """
+    bands = Band.__table__
+    with engine.begin() as conn:
+        if _has_index(conn, "bands", "ix_bands_name_lower"):
+            return
+        rows = conn.execute(select(bands.c.id, bands.c.name, func.lower(bands.c.name)).order_by(bands.c.id)).all()
+        keep = {}
+        for band_id, name, key in rows:
+            keeper = keep.setdefault(key, (band_id, name))
+            if keeper[0] == band_id:
+                continue
+            print(f"Merging band {band_id} {name!r} into {keeper[0]} {keeper[1]!r} (case-insensitive duplicate)")
+            keeper = keeper[0]
+            # move line-up entries to the keeper unless the event already lists it
+            already = select(event_bands.c.event_id).where(event_bands.c.band_id == keeper)
+            conn.execute(
+                update(event_bands)
+                .where(event_bands.c.band_id == band_id, event_bands.c.event_id.not_in(already))
+                .values(band_id=keeper)
+            )
+            conn.execute(delete(event_bands).where(event_bands.c.band_id == band_id))
+            conn.execute(delete(bands).where(bands.c.id == band_id))
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    _merge_case_duplicate_bands()
+    # create_all skips indexes on tables that already exist. IF NOT EXISTS rather
+    # than checkfirst: reflection can't see expression indexes like ix_bands_name_lower.
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def init_db_if_missing():
+    """First-run setup for the CLI scripts: only runs init_db() when tables are missing."""
+    if not set(Base.metadata.tables) <= set(inspect(engine).get_table_names()):
+        init_db()
+
+
+if __name__ == "__main__":
+    init_db()
+    print("✅ Database tables and indexes are in place.")
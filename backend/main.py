@@ -1,10 +1,16 @@
+import os
+import time
+from collections import defaultdict
 from datetime import datetime
-from fastapi import FastAPI, Depends, HTTPException, status
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from .database import Base, engine, SessionLocal
-from .models import Band, Venue, Event
+from .database import SessionLocal
+from .init_db import init_db
+from .models import Band, Venue, Event, event_bands
 from .schemas import (
     BandCreate, BandUpdate, BandOut,
     VenueCreate, VenueUpdate, VenueOut,
@@ -25,7 +31,10 @@ app.add_middleware(
 )
 
 # --- Initialize DB tables
-Base.metadata.create_all(bind=engine)
+# Schema setup is a deploy step (python -m backend.init_db); set
+# AUTO_CREATE_TABLES=1 to have the app do it at startup, e.g. in local dev.
+if os.getenv("AUTO_CREATE_TABLES") == "1":
+    init_db()
 
 
 # --- Dependency for DB sessions
@@ -37,6 +46,38 @@ def get_db():
         db.close()
 
 
+# --- Cache for the public list endpoints
+# Admin writes bump the version and drop every entry; the TTL bounds staleness
+# for writes made outside the API (e.g. the CSV importers).
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", "5"))
+_list_cache = {"v": 0, "entries": {}}
+
+
+def _invalidate_lists():
+    _list_cache["v"] += 1
+    _list_cache["entries"].clear()
+
+
+def _cached_list(key, build):
+    now = time.monotonic()
+    hit = _list_cache["entries"].get(key)
+    if hit and now - hit[0] < LIST_CACHE_TTL:
+        return hit[1]
+    v = _list_cache["v"]
+    data = build()
+    # skip storing if a write landed while we were building
+    if v == _list_cache["v"]:
+        _list_cache["entries"][key] = (now, data)
+    return data
+
+
+def _json_list(key, build):
+    # The list endpoints have no response model, so encode with orjson ourselves
+    # (once per cache fill) instead of going through jsonable_encoder + json.dumps
+    body = _cached_list(key, lambda: orjson.dumps(build()))
+    return Response(content=body, media_type="application/json")
+
+
 # --- Root healthcheck
 @app.get("/")
 def root():
@@ -49,52 +90,63 @@ def root():
 
 @app.get("/bands")
 def list_bands(db: Session = Depends(get_db)):
-    rows = db.query(Band).order_by(Band.name.asc()).all()
-    return [
-        {
-            "id": b.id,
-            "name": b.name,
-            "genre": b.genre,
-            "city": b.city,
-            "instagram": b.instagram,
-            "youtube": b.youtube,
-            "description": b.description,
-        }
-        for b in rows
-    ]
+    def build():
+        rows = db.query(Band).order_by(Band.name.asc()).all()
+        return [
+            {
+                "id": b.id,
+                "name": b.name,
+                "genre": b.genre,
+                "city": b.city,
+                "instagram": b.instagram,
+                "youtube": b.youtube,
+                "description": b.description,
+            }
+            for b in rows
+        ]
+
+    return _json_list("bands", build)
 
 
 @app.post("/bands", response_model=BandOut, dependencies=[Depends(require_admin)])
 def create_band(payload: BandCreate, db: Session = Depends(get_db)):
-    if db.query(Band).filter(Band.name == payload.name).first():
+    # lower() on both sides so the check folds case exactly like ix_bands_name_lower
+    if db.query(Band).filter(func.lower(Band.name) == func.lower(payload.name)).first():
         raise HTTPException(status_code=400, detail="Band with this name already exists")
     b = Band(**payload.model_dump())
     db.add(b)
     db.commit()
+    _invalidate_lists()
     db.refresh(b)
     return b
 
 
 @app.put("/bands/{band_id}", response_model=BandOut, dependencies=[Depends(require_admin)])
 def update_band(band_id: int, payload: BandUpdate, db: Session = Depends(get_db)):
-    b = db.query(Band).get(band_id)
+    b = db.get(Band, band_id)
     if not b:
         raise HTTPException(status_code=404, detail="Band not found")
     data = payload.model_dump(exclude_unset=True)
+    if data.get("name") is not None and db.query(Band).filter(
+        func.lower(Band.name) == func.lower(data["name"]), Band.id != band_id
+    ).first():
+        raise HTTPException(status_code=400, detail="Band with this name already exists")
     for k, v in data.items():
         setattr(b, k, v)
     db.commit()
+    _invalidate_lists()
     db.refresh(b)
     return b
 
 
 @app.delete("/bands/{band_id}", status_code=204, dependencies=[Depends(require_admin)])
 def delete_band(band_id: int, db: Session = Depends(get_db)):
-    b = db.query(Band).get(band_id)
+    b = db.get(Band, band_id)
     if not b:
         raise HTTPException(status_code=404, detail="Band not found")
     db.delete(b)
     db.commit()
+    _invalidate_lists()
     return None
 
 
@@ -104,21 +156,24 @@ def delete_band(band_id: int, db: Session = Depends(get_db)):
 
 @app.get("/venues")
 def list_venues(db: Session = Depends(get_db)):
-    rows = db.query(Venue).order_by(Venue.name.asc()).all()
-    return [
-        {
-            "id": v.id,
-            "name": v.name,
-            "address": v.address,
-            "district": v.district,
-            "lat": v.lat,
-            "lon": v.lon,
-            "instagram": v.instagram,
-            "website": v.website,
-            "notes": v.notes,
-        }
-        for v in rows
-    ]
+    def build():
+        rows = db.query(Venue).order_by(Venue.name.asc()).all()
+        return [
+            {
+                "id": v.id,
+                "name": v.name,
+                "address": v.address,
+                "district": v.district,
+                "lat": v.lat,
+                "lon": v.lon,
+                "instagram": v.instagram,
+                "website": v.website,
+                "notes": v.notes,
+            }
+            for v in rows
+        ]
+
+    return _json_list("venues", build)
 
 
 @app.post("/venues", response_model=VenueOut, dependencies=[Depends(require_admin)])
@@ -128,30 +183,33 @@ def create_venue(payload: VenueCreate, db: Session = Depends(get_db)):
     v = Venue(**payload.model_dump())
     db.add(v)
     db.commit()
+    _invalidate_lists()
     db.refresh(v)
     return v
 
 
 @app.put("/venues/{venue_id}", response_model=VenueOut, dependencies=[Depends(require_admin)])
 def update_venue(venue_id: int, payload: VenueUpdate, db: Session = Depends(get_db)):
-    v = db.query(Venue).get(venue_id)
+    v = db.get(Venue, venue_id)
     if not v:
         raise HTTPException(status_code=404, detail="Venue not found")
     data = payload.model_dump(exclude_unset=True)
     for k, val in data.items():
         setattr(v, k, val)
     db.commit()
+    _invalidate_lists()
     db.refresh(v)
     return v
 
 
 @app.delete("/venues/{venue_id}", status_code=204, dependencies=[Depends(require_admin)])
 def delete_venue(venue_id: int, db: Session = Depends(get_db)):
-    v = db.query(Venue).get(venue_id)
+    v = db.get(Venue, venue_id)
     if not v:
         raise HTTPException(status_code=404, detail="Venue not found")
     db.delete(v)
     db.commit()
+    _invalidate_lists()
     return None
 
 
@@ -162,44 +220,81 @@ def delete_venue(venue_id: int, db: Session = Depends(get_db)):
 def _apply_event_bands(ev: Event, band_ids, db: Session):
     if band_ids is None:
         return
-    bands = db.query(Band).filter(Band.id.in_(band_ids)).all() if band_ids else []
-    ev.bands = bands
-
+    # Only insert/delete the association rows that actually change
+    wanted = set(db.scalars(select(Band.id).where(Band.id.in_(band_ids)))) if band_ids else set()
+    current = set(db.scalars(select(event_bands.c.band_id).where(event_bands.c.event_id == ev.id)))
+    to_add, to_del = wanted - current, current - wanted
+    if to_add:
+        db.execute(event_bands.insert(), [{"event_id": ev.id, "band_id": b} for b in to_add])
+    if to_del:
+        db.execute(
+            event_bands.delete()
+            .where(event_bands.c.event_id == ev.id)
+            .where(event_bands.c.band_id.in_(to_del))
+        )
+    if to_add or to_del:
+        db.expire(ev, ["bands"])
+
+
+def _load_event(db: Session, event_id: int) -> Event:
+    # The saved event is still in the identity map; populate_existing makes get()
+    # reload it so the eager-load options are applied
+    return db.get(Event, event_id, options=[joinedload(Event.venue), selectinload(Event.bands)], populate_existing=True)
 
 @app.get("/events")
 def list_events(include_past: bool = False, db: Session = Depends(get_db)):
     """List all events. By default, only shows upcoming ones."""
-    q = db.query(Event).options(joinedload(Event.venue), joinedload(Event.bands))
-    if not include_past:
-        now = datetime.now()
-        q = q.filter(Event.starts_at >= now)
-    rows = q.order_by(Event.starts_at.asc()).all()
-
-    def serialize(e: Event):
-        return {
-            "id": e.id,
-            "title": e.title,
-            "starts_at": e.starts_at.isoformat() if e.starts_at else None,
-            "ends_at": e.ends_at.isoformat() if e.ends_at else None,
-            "price": e.price,
-            "poster_url": e.poster_url,
-            "url": e.url,
-            "venue": {
-                "id": e.venue.id if e.venue else None,
-                "name": e.venue.name if e.venue else None,
-                "lat": e.venue.lat if e.venue else None,
-                "lon": e.venue.lon if e.venue else None,
-                "address": e.venue.address if e.venue else None,
-            },
-            "bands": [{"id": b.id, "name": b.name} for b in e.bands],
-        }
-
-    return [serialize(e) for e in rows]
+    def build():
+        # Plain column rows instead of mapped Event/Venue/Band objects
+        stmt = select(
+            Event.id, Event.title, Event.starts_at, Event.ends_at, Event.price, Event.poster_url, Event.url,
+            Venue.id.label("v_id"), Venue.name.label("v_name"), Venue.lat.label("v_lat"),
+            Venue.lon.label("v_lon"), Venue.address.label("v_address"),
+        ).outerjoin(Venue, Venue.id == Event.venue_id)
+        event_ids = select(Event.id)
+        if not include_past:
+            now = datetime.now()
+            stmt = stmt.where(Event.starts_at >= now)
+            event_ids = event_ids.where(Event.starts_at >= now)
+        ev_rows = db.execute(stmt.order_by(Event.starts_at.asc())).all()
+
+        # Line-ups for the same events in one query
+        bands_by_event = defaultdict(list)
+        band_rows = db.execute(
+            select(event_bands.c.event_id, Band.id, Band.name)
+            .join(Band, Band.id == event_bands.c.band_id)
+            .where(event_bands.c.event_id.in_(event_ids))
+        )
+        for event_id, band_id, band_name in band_rows:
+            bands_by_event[event_id].append({"id": band_id, "name": band_name})
+
+        return [
+            {
+                "id": r.id,
+                "title": r.title,
+                "starts_at": r.starts_at,
+                "ends_at": r.ends_at,
+                "price": r.price,
+                "poster_url": r.poster_url,
+                "url": r.url,
+                "venue": {
+                    "id": r.v_id,
+                    "name": r.v_name,
+                    "lat": r.v_lat,
+                    "lon": r.v_lon,
+                    "address": r.v_address,
+                },
+                "bands": bands_by_event[r.id],
+            }
+            for r in ev_rows
+        ]
+
+    return _json_list(("events", include_past), build)
 
 
 @app.post("/events", response_model=EventOut, dependencies=[Depends(require_admin)])
 def create_event(payload: EventCreate, db: Session = Depends(get_db)):
-    venue = db.query(Venue).get(payload.venue_id)
+    venue = db.get(Venue, payload.venue_id)
     if not venue:
         raise HTTPException(status_code=400, detail="Invalid venue_id")
 
@@ -214,21 +309,22 @@ def create_event(payload: EventCreate, db: Session = Depends(get_db)):
     )
     db.add(ev)
     db.flush()
+    event_id = ev.id  # read before commit expires ev, which would cost a reload
     _apply_event_bands(ev, payload.band_ids, db)
     db.commit()
-    db.refresh(ev)
-    return db.query(Event).options(joinedload(Event.venue), joinedload(Event.bands)).get(ev.id)
+    _invalidate_lists()
+    return _load_event(db, event_id)
 
 
 @app.put("/events/{event_id}", response_model=EventOut, dependencies=[Depends(require_admin)])
 def update_event(event_id: int, payload: EventUpdate, db: Session = Depends(get_db)):
-    ev = db.query(Event).get(event_id)
+    ev = db.get(Event, event_id)
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
 
     data = payload.model_dump(exclude_unset=True)
     if "venue_id" in data:
-        venue = db.query(Venue).get(data["venue_id"])
+        venue = db.get(Venue, data["venue_id"])
         if not venue:
             raise HTTPException(status_code=400, detail="Invalid venue_id")
 
@@ -239,16 +335,17 @@ def update_event(event_id: int, payload: EventUpdate, db: Session = Depends(get_
         _apply_event_bands(ev, data["band_ids"], db)
 
     db.commit()
-    db.refresh(ev)
-    return db.query(Event).options(joinedload(Event.venue), joinedload(Event.bands)).get(event_id)
+    _invalidate_lists()
+    return _load_event(db, event_id)
 
 
 @app.delete("/events/{event_id}", status_code=204, dependencies=[Depends(require_admin)])
 def delete_event(event_id: int, db: Session = Depends(get_db)):
-    ev = db.query(Event).get(event_id)
+    ev = db.get(Event, event_id)
     if not ev:
         raise HTTPException(status_code=404, detail="Event not found")
     ev.bands = []  # detach many-to-many
     db.delete(ev)
     db.commit()
+    _invalidate_lists()
     return None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Table, Index, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -9,6 +9,8 @@ event_bands = Table(
     Column("event_id", ForeignKey("events.id"), primary_key=True),
     Column("band_id", ForeignKey("bands.id"), primary_key=True),
 )
+# The primary key covers lookups by event; this one serves Band.events
+Index("ix_event_bands_band_id", event_bands.c.band_id)
 
 
 class Band(Base):
@@ -23,6 +25,10 @@ class Band(Base):
     description = Column(Text, nullable=True)
 
 
+# Band names are unique regardless of case ("Tiny Bunny" == "tiny bunny")
+Index("ix_bands_name_lower", func.lower(Band.name), unique=True)
+
+
 class Venue(Base):
     __tablename__ = "venues"
 
@@ -42,7 +48,7 @@ class Event(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
-    starts_at = Column(DateTime, nullable=False)
+    starts_at = Column(DateTime, nullable=False, index=True)
     ends_at = Column(DateTime, nullable=True)
     venue_id = Column(Integer, ForeignKey("venues.id"), nullable=False)
     price = Column(String(60), nullable=True)  # e.g. "Presale 50k | OTS 80k"
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from .database import Base, engine, SessionLocal
+from .database import SessionLocal
+from .init_db import init_db_if_missing
 from .models import Band, Venue, Event
 
-Base.metadata.create_all(bind=engine)
+init_db_if_missing()
 
 db: Session = SessionLocal()
 